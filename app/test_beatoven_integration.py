@@ -6,30 +6,30 @@ import os
 import sys
 import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
-
-# Check if we have the API key
-BEATOVEN_API_KEY = os.getenv("BEATOVEN_API_KEY")
-if not BEATOVEN_API_KEY:
-    print("ERROR: BEATOVEN_API_KEY environment variable is not set")
-    sys.exit(1)
-
 # API Configuration
 BASE_URL = "https://public-api.beatoven.ai/api/v1"
-HEADERS = {
-    "Authorization": f"Bearer {BEATOVEN_API_KEY}",
-    "Content-Type": "application/json"
-}
+
+# One keep-alive session for every call, so status polls don't redo the TLS handshake.
+# The Authorization header is added in run_integration_tests once the key is known.
+session = requests.Session()
+session.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+))
+session.headers["Content-Type"] = "application/json"
 
 def test_beatoven_api_connection():
     """Test basic connection to Beatoven.ai API"""
     try:
         # Just a simple GET request to test authentication
-        response = requests.get(f"{BASE_URL}/tracks", headers=HEADERS)
+        response = session.get(f"{BASE_URL}/tracks")
         response.raise_for_status()
         print("✅ Beatoven.ai API connection successful!")
         print(f"Response status: {response.status_code}")
@@ -51,7 +51,7 @@ def test_create_track(genre, prompt, duration=60, name="Test Track"):
     print(f"Prompt: \"{prompt}\"")
     
     try:
-        response = requests.post(f"{BASE_URL}/tracks", headers=HEADERS, json=payload)
+        response = session.post(f"{BASE_URL}/tracks", json=payload)
         response.raise_for_status()
         track_data = response.json()
         track_id = track_data.get("id")
@@ -74,7 +74,7 @@ def test_create_track(genre, prompt, duration=60, name="Test Track"):
 def test_get_track_status(track_id):
     """Test getting a track's status"""
     try:
-        response = requests.get(f"{BASE_URL}/tracks/{track_id}", headers=HEADERS)
+        response = session.get(f"{BASE_URL}/tracks/{track_id}")
         response.raise_for_status()
         track_data = response.json()
         
@@ -118,6 +118,13 @@ def test_wait_for_track_completion(track_id, timeout=300, interval=10):
 
 def run_integration_tests():
     """Run all integration tests"""
+    # Check if we have the API key
+    api_key = os.getenv("BEATOVEN_API_KEY")
+    if not api_key:
+        print("ERROR: BEATOVEN_API_KEY environment variable is not set")
+        sys.exit(1)
+    session.headers["Authorization"] = f"Bearer {api_key}"
+
     print("🔍 Starting Beatoven.ai integration tests\n")
     
     # Test API connection
@@ -154,13 +161,20 @@ def run_integration_tests():
         if track_id:
             successful_tracks.append({"id": track_id, "data": track_data, "name": test_case["name"]})
     
-    # Wait for track generation to complete
-    for track in successful_tracks:
-        complete_data = test_wait_for_track_completion(track["id"])
-        if complete_data and complete_data.get("previewUrl"):
-            print(f"\n✅ {track['name']} is ready at: {complete_data['previewUrl']}")
+    # Wait for all tracks at once - total time is the slowest track, not the sum
+    if successful_tracks:
+        with ThreadPoolExecutor(max_workers=len(successful_tracks)) as executor:
+            completed = list(executor.map(
+                lambda track: test_wait_for_track_completion(track["id"]),
+                successful_tracks
+            ))
+        for track, complete_data in zip(successful_tracks, completed):
+            if complete_data and complete_data.get("previewUrl"):
+                print(f"\n✅ {track['name']} is ready at: {complete_data['previewUrl']}")
     
     print("\n🏁 Integration tests completed")
 
 if __name__ == "__main__":
+    # Load environment variables
+    load_dotenv()
     run_integration_tests()
\ No newline at end of file
@@ -5,11 +5,14 @@ This runs against a local FastAPI server and tests the /api/music/generate endpo
 """
 import sys
 import json
-import requests
+import asyncio
+import httpx
 import time
 import subprocess
+import threading
 import os
 import signal
+import uvicorn
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -17,42 +20,103 @@ load_dotenv()
 
 # Configuration
 API_URL = "http://localhost:8000"
-SERVER_PROCESS = None
+VERBOSE = os.getenv("TEST_VERBOSE") == "1" or "-v" in sys.argv[1:]
+SERVER_PROCESS = None  # Out-of-process server (OUT_OF_PROC_SERVER=1)
+SERVER = None  # In-process uvicorn.Server and the thread running it
+SERVER_THREAD = None
 
-def start_server():
+# Music generation cases, built once at import rather than on every run
+TEST_CASES = (
+    {
+        "genre": "hip_hop",
+        "topic": "photosynthesis",
+        "description": "Hip hop track about photosynthesis"
+    },
+    {
+        "genre": "country",
+        "topic": "American Revolution",
+        "description": "Country song about the American Revolution"
+    },
+    {
+        "genre": "hip_hop",
+        "topic": "geometry",
+        "custom_prompt": "Educational hip hop with math-inspired beats",
+        "description": "Hip hop with custom prompt about geometry"
+    },
+)
+
+def create_client():
+    """One keep-alive client for every call, so requests reuse sockets to the local server"""
+    return httpx.AsyncClient(
+        base_url=API_URL,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        timeout=httpx.Timeout(30.0, connect=5.0)
+    )
+
+async def server_is_up(client):
+    """Single quick health probe, used to reuse a server that's already running"""
+    try:
+        return (await client.get("/api/health", timeout=0.5)).status_code == 200
+    except httpx.HTTPError:
+        return False
+
+async def wait_until_ready(client, deadline=15.0):
+    """Poll the health endpoint with capped exponential backoff until it answers 200"""
+    give_up_at = time.monotonic() + deadline
+    attempt = 0
+    while time.monotonic() < give_up_at:
+        # No point waiting on a server that has already exited
+        if SERVER_PROCESS and SERVER_PROCESS.poll() is not None:
+            return False
+        if SERVER_THREAD and not SERVER_THREAD.is_alive():
+            return False
+        # In-process, uvicorn tells us directly once it's listening
+        if (SERVER is None or SERVER.started) and await server_is_up(client):
+            return True
+        await asyncio.sleep(min(0.05 * 2 ** attempt, 0.5))
+        attempt += 1
+    return False
+
+async def start_server(client):
     """Start the FastAPI server in the background"""
-    global SERVER_PROCESS
+    global SERVER_PROCESS, SERVER, SERVER_THREAD
     print("🚀 Starting FastAPI server...")
     
-    # Start server as a subprocess
-    SERVER_PROCESS = subprocess.Popen(
-        ["python3", "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", "8000"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        preexec_fn=os.setsid  # So we can kill the process group later
-    )
-    
-    # Wait for server to start
-    time.sleep(3)
+    if os.getenv("OUT_OF_PROC_SERVER"):
+        # Start server as a subprocess, for runs that need full process isolation
+        SERVER_PROCESS = subprocess.Popen(
+            ["python3", "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", "8000"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            preexec_fn=os.setsid  # So we can kill the process group later
+        )
+    else:
+        # Run uvicorn on a thread in this process - no fork/exec or second import chain
+        SERVER = uvicorn.Server(uvicorn.Config("main:app", host="127.0.0.1", port=8000, log_level="warning"))
+        SERVER_THREAD = threading.Thread(target=SERVER.run, daemon=True)
+        SERVER_THREAD.start()
     
-    # Check if server is running by pinging the health endpoint
-    try:
-        health_response = requests.get(f"{API_URL}/api/health")
-        if health_response.status_code == 200:
-            print("✅ Server started successfully!")
-            return True
-        else:
-            print(f"❌ Server health check failed with status code {health_response.status_code}")
-            stop_server()
-            return False
-    except requests.exceptions.ConnectionError:
-        print("❌ Failed to connect to server")
-        stop_server()
-        return False
+    # Wait for the server by polling the health endpoint rather than sleeping a fixed time
+    if await wait_until_ready(client):
+        print("✅ Server started successfully!")
+        return True
+
+    print("❌ Server did not become healthy in time")
+    stop_server()
+    return False
 
 def stop_server():
     """Stop the FastAPI server"""
-    global SERVER_PROCESS
+    global SERVER_PROCESS, SERVER, SERVER_THREAD
+    if SERVER_THREAD:
+        print("🛑 Stopping FastAPI server...")
+        SERVER.should_exit = True
+        SERVER_THREAD.join(timeout=5)
+        if SERVER_THREAD.is_alive():
+            print("⚠️ Server did not stop within 5 seconds")
+        else:
+            print("✅ Server stopped successfully")
+        SERVER = SERVER_THREAD = None
     if SERVER_PROCESS:
         print("🛑 Stopping FastAPI server...")
         try:
@@ -68,11 +132,11 @@ def stop_server():
         finally:
             SERVER_PROCESS = None
 
-def test_music_genre_endpoint():
+async def test_music_genre_endpoint(client):
     """Test the /api/music/genres endpoint"""
     print("\n🔍 Testing /api/music/genres endpoint...")
     try:
-        response = requests.get(f"{API_URL}/api/music/genres")
+        response = await client.get("/api/music/genres")
         if response.status_code == 200:
             genres = response.json()
             print(f"✅ Successfully retrieved {len(genres)} music genres")
@@ -80,11 +144,11 @@ def test_music_genre_endpoint():
         else:
             print(f"❌ Failed to get music genres: {response.status_code}")
             return None
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"❌ Error: {str(e)}")
         return None
 
-def test_music_generation_endpoint(genre, topic, custom_prompt=None, duration=60):
+async def test_music_generation_endpoint(client, genre, topic, custom_prompt=None, duration=60):
     """Test the /api/music/generate endpoint"""
     request_body = {
         "genre": genre,
@@ -96,13 +160,11 @@ def test_music_generation_endpoint(genre, topic, custom_prompt=None, duration=60
         request_body["custom_prompt"] = custom_prompt
     
     print(f"\n🎵 Testing music generation: {genre} about {topic}")
-    print(f"Request payload: {json.dumps(request_body, indent=2)}")
+    # Indented JSON is only worth building when someone asked to read it
+    print(f"Request payload: {json.dumps(request_body, indent=2) if VERBOSE else request_body}")
     
     try:
-        response = requests.post(
-            f"{API_URL}/api/music/generate", 
-            json=request_body
-        )
+        response = await client.post("/api/music/generate", json=request_body)
         
         if response.status_code == 200:
             result = response.json()
@@ -114,11 +176,11 @@ def test_music_generation_endpoint(genre, topic, custom_prompt=None, duration=60
             print(f"❌ Music generation failed: {response.status_code}")
             print(f"Response: {response.text}")
             return None
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"❌ Error: {str(e)}")
         return None
 
-def test_generate_endpoint_with_beatoven(topic, genre="hip_hop", duration=60):
+async def test_generate_endpoint_with_beatoven(client, topic, genre="hip_hop", duration=60):
     """Test the main /api/generate endpoint with Beatoven.ai model"""
     request_body = {
         "input": f"Create a song about {topic}",
@@ -129,13 +191,11 @@ def test_generate_endpoint_with_beatoven(topic, genre="hip_hop", duration=60):
     }
     
     print(f"\n🔄 Testing general /api/generate endpoint with Beatoven model")
-    print(f"Request payload: {json.dumps(request_body, indent=2)}")
+    # Indented JSON is only worth building when someone asked to read it
+    print(f"Request payload: {json.dumps(request_body, indent=2) if VERBOSE else request_body}")
     
     try:
-        response = requests.post(
-            f"{API_URL}/api/generate", 
-            json=request_body
-        )
+        response = await client.post("/api/generate", json=request_body)
         
         if response.status_code == 200:
             result = response.json()
@@ -148,63 +208,64 @@ def test_generate_endpoint_with_beatoven(topic, genre="hip_hop", duration=60):
             print(f"❌ Generation failed: {response.status_code}")
             print(f"Response: {response.text}")
             return None
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"❌ Error: {str(e)}")
         return None
 
 def run_integration_tests():
     """Run all integration tests"""
+    asyncio.run(run_integration_tests_async())
+
+async def run_integration_tests_async():
     # Make sure the BEATOVEN_API_KEY is set
     if not os.getenv("BEATOVEN_API_KEY"):
         print("⚠️ WARNING: BEATOVEN_API_KEY environment variable is not set")
         print("Tests will run but actual Beatoven.ai API calls will fail")
     
-    # Start the server
-    if not start_server():
+    async with create_client() as client:
+        await run_against_server(client)
+
+async def run_against_server(client):
+    # Reuse a server that's already up (e.g. a dev server); only start and stop our own
+    started_here = False
+    if await server_is_up(client):
+        print("♻️ Reusing the API server already running at", API_URL)
+    elif await start_server(client):
+        started_here = True
+    else:
         print("❌ Cannot continue with tests as server failed to start")
         return
     
     try:
         # Test getting available genres
-        test_music_genre_endpoint()
+        await test_music_genre_endpoint(client)
         
-        # Test music generation with different genres
-        test_cases = [
-            {
-                "genre": "hip_hop",
-                "topic": "photosynthesis",
-                "description": "Hip hop track about photosynthesis"
-            },
-            {
-                "genre": "country",
-                "topic": "American Revolution",
-                "description": "Country song about the American Revolution"
-            },
-            {
-                "genre": "hip_hop",
-                "topic": "geometry",
-                "custom_prompt": "Educational hip hop with math-inspired beats",
-                "description": "Hip hop with custom prompt about geometry"
-            }
-        ]
-        
-        for test_case in test_cases:
-            test_music_generation_endpoint(
-                genre=test_case["genre"],
-                topic=test_case["topic"],
-                custom_prompt=test_case.get("custom_prompt")
+        # Test music generation with different genres.
+        # The cases are independent and mostly wait on Beatoven, so run them all at once
+        # over the shared client
+        await asyncio.gather(
+            *(
+                test_music_generation_endpoint(
+                    client,
+                    genre=test_case["genre"],
+                    topic=test_case["topic"],
+                    custom_prompt=test_case.get("custom_prompt")
+                )
+                for test_case in TEST_CASES
+            ),
+            # Test the main generate endpoint with Beatoven model
+            test_generate_endpoint_with_beatoven(
+                client,
+                topic="solar system",
+                genre="country"
             )
-        
-        # Test the main generate endpoint with Beatoven model
-        test_generate_endpoint_with_beatoven(
-            topic="solar system",
-            genre="country"
         )
         
         print("\n✅ All tests completed!")
     finally:
-        # Stop the server
-        stop_server()
+        # Stop the server if this run started it
+        if started_here:
+            stop_server()
 
 if __name__ == "__main__":
     run_integration_tests()
\ No newline at end of file
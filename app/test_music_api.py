@@ -3,6 +3,7 @@ import sys
 import json
 import os
 import random
+import asyncio
 
 # Mock the environment for testing
 os.environ["BEATOVEN_API_KEY"] = "mock_key_for_testing"
@@ -11,10 +12,14 @@ from main import generate_music, GENRE_PROMPTS
 
 def test_music_generation():
     """Test the music generation function with different genres"""
-    
+    # generate_music is async; run every case on one event loop so the
+    # shared Beatoven client's connection pool stays usable between calls
+    asyncio.run(run_music_generation())
+
+async def run_music_generation():
     # Test hip-hop genre
     print("\n--- Testing Hip Hop Genre ---")
-    result = generate_music(
+    result = await generate_music(
         genre="hip_hop", 
         duration=60, 
         topic="photosynthesis"
@@ -23,7 +28,7 @@ def test_music_generation():
     
     # Test country genre
     print("\n--- Testing Country Genre ---")
-    result = generate_music(
+    result = await generate_music(
         genre="country", 
         duration=60, 
         topic="American Revolution"
@@ -32,7 +37,7 @@ def test_music_generation():
     
     # Test with custom prompt
     print("\n--- Testing Custom Prompt ---")
-    result = generate_music(
+    result = await generate_music(
         genre="hip_hop", 
         duration=60, 
         topic="quantum physics",
@@ -42,7 +47,7 @@ def test_music_generation():
     
     # Test genre not in predefined prompts
     print("\n--- Testing Genre Without Predefined Prompts ---")
-    result = generate_music(
+    result = await generate_music(
         genre="classical", 
         duration=90, 
         topic="ancient Greece"
@@ -51,10 +56,16 @@ def test_music_generation():
     
     # Print all available genre prompts
     print("\n--- Available Genre Prompts ---")
-    for genre, prompts in GENRE_PROMPTS.items():
-        print(f"{genre.upper()}: {len(prompts)} prompt(s) available")
-        for i, prompt in enumerate(prompts):
-            print(f"  {i+1}. {prompt}")
+    # Build every line first and write once, keeping each genre's prompts under its header
+    lines = [
+        line
+        for genre, prompts in GENRE_PROMPTS.items()
+        for line in (
+            f"{genre.upper()}: {len(prompts)} prompt(s) available",
+            *(f"  {i+1}. {prompt}" for i, prompt in enumerate(prompts)),
+        )
+    ]
+    print("\n".join(lines))
 
 if __name__ == "__main__":
     test_music_generation()
\ No newline at end of file
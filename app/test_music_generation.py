@@ -5,6 +5,7 @@ This doesn't require starting a server.
 """
 import os
 import json
+import asyncio
 from dotenv import load_dotenv
 from main import generate_music, generate_lyrics_for_topic
 
@@ -13,6 +14,9 @@ load_dotenv()
 
 def test_generate_music():
     """Test the generate_music function directly"""
+    asyncio.run(run_generate_music())
+
+async def run_generate_music():
     print("Testing music generation...")
     
     # Make sure TEST_MODE is set
@@ -21,7 +25,7 @@ def test_generate_music():
     # Test with different genres
     for genre in ["hip_hop", "country", "pop"]:
         print(f"\nTesting {genre} genre:")
-        result = generate_music(
+        result = await generate_music(
             genre=genre,
             duration=60,
             topic="photosynthesis",
@@ -4,7 +4,6 @@ Main server runner for the Genesis Music Learning API
 import os
 import sys
 import uvicorn
-from app.main import app
 
 if __name__ == "__main__":
     print("Starting Genesis Music Learning API server...")
@@ -17,6 +16,15 @@ if __name__ == "__main__":
     host = os.getenv("API_HOST", "0.0.0.0")
     port = int(os.getenv("API_PORT", 8000))
     
-    # Run the server
+    # Run the server - pass the import string so uvicorn can reload; uvloop and httptools
+    # ship with uvicorn[standard]. Always one worker: the app keeps its state in memory.
     print(f"Server running on http://{host}:{port}")
-    uvicorn.run(app, host=host, port=port, log_level="info")
\ No newline at end of file
+    uvicorn.run(
+        "app.main:app",
+        host=host,
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        reload=os.getenv("UVICORN_RELOAD", "0") == "1",
+        log_level="info",
+    )